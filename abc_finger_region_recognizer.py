@@ -1,30 +1,41 @@
 from abc import ABC, abstractmethod
+import weakref
 import numpy as np
 import cv2
 from skimage.morphology import skeletonize as ski_skeletonize
 
+try:
+    import numba
+except ImportError:
+    numba = None
+
 
 class Access(type):
 
     __SENTINEL = object()
+    _final_cache: weakref.WeakKeyDictionary[type, frozenset[str]] = (
+        weakref.WeakKeyDictionary()
+    )
 
     def __new__(mcs, name, bases, class_dict):
-        private = {
-            key
-            for base in bases
-            for key, value in vars(base).items()
-            if callable(value) and mcs.__is_final(value)
-        }
+        private = {key for base in bases for key in mcs.__final_names(base)}
         if any(key in private for key in class_dict):
             raise RuntimeError("certain methods may not be overridden")
         return super().__new__(mcs, name, bases, class_dict)
 
+    @classmethod
+    def __final_names(mcs, base):
+        if base not in mcs._final_cache:
+            mcs._final_cache[base] = frozenset(
+                key
+                for key, value in vars(base).items()
+                if callable(value) and mcs.__is_final(value)
+            )
+        return mcs._final_cache[base]
+
     @classmethod
     def __is_final(mcs, method):
-        try:
-            return method.__final is mcs.__SENTINEL
-        except AttributeError:
-            return False
+        return getattr(method, "_Access__final", None) is mcs.__SENTINEL
 
     @classmethod
     def final(mcs, method):
@@ -32,6 +43,93 @@ class Access(type):
         return method
 
 
+def _jit(func):
+    # Compile with numba when it is installed, otherwise run as plain Python.
+    if numba is None:
+        return func
+    return numba.njit(cache=True, boundscheck=False)(func)
+
+
+_K1x3 = np.ones((1, 3), dtype=np.uint8)
+_K3x1 = np.ones((3, 1), dtype=np.uint8)
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# Minutiae weight by crossing number: 2 for a termination, 1 for a bifurcation.
+_CROSSING_WEIGHTS = np.array([0, 2, 0, 1, 0], dtype=np.uint8)
+
+# Correlating a 0/1 image with this kernel packs each pixel's ring into one
+# byte, bit k holding the k-th neighbour clockwise from the top-left.
+_NEIGHBOR_CODE_KERNEL = np.array(
+    [[1, 2, 4], [128, 0, 8], [64, 32, 16]], dtype=np.float32
+)
+
+# Minutiae weight of every ring code. Each 0/1 change around the ring is a set
+# bit of the code XOR its one-bit rotation; half of them is the crossing number.
+_RING_CODES = np.arange(256, dtype=np.uint8)
+_CODE_WEIGHTS = _CROSSING_WEIGHTS[
+    _POPCOUNT[_RING_CODES ^ ((_RING_CODES << 1) | (_RING_CODES >> 7))] >> 1
+]
+
+
+def _window_sums(integral, block_size, shape_block):
+    # Strided views over the summed-area table pick the four corners of every
+    # candidate window, placed at whole-block offsets starting one block in.
+    top = slice(block_size, max(integral.shape[0] - shape_block, 0), block_size)
+    bottom = slice(block_size + shape_block, None, block_size)
+    left = slice(block_size, max(integral.shape[1] - shape_block, 0), block_size)
+    right = slice(block_size + shape_block, None, block_size)
+    return (
+        integral[bottom, right]
+        - integral[top, right]
+        - integral[bottom, left]
+        + integral[top, left]
+    )
+
+
+def _compute_valid_grid(mask, block_size, shape_block):
+    # True for every candidate window that lies entirely inside the mask.
+    mask_pixels = mask.view(np.uint8)
+    if cv2.countNonZero(mask_pixels) < shape_block * shape_block:
+        # Too little foreground to fill even one window: skip the table.
+        rows, cols = mask.shape
+        return np.zeros(
+            (
+                len(range(block_size, rows - shape_block + 1, block_size)),
+                len(range(block_size, cols - shape_block + 1, block_size)),
+            ),
+            dtype=bool,
+        )
+    mask_integral = cv2.integral(mask_pixels, sdepth=cv2.CV_32S)
+    mask_sums = _window_sums(mask_integral, block_size, shape_block)
+    return mask_sums == shape_block * shape_block
+
+
+@_jit
+def _count_both_diagonals(image):
+    # Ridges are 0 and anything else is background, so the eroded skeleton
+    # needs no thresholding first.
+    last_col = image.shape[1] - 1
+    is_white_main = True
+    is_white_secondary = True
+    main_counter = 0
+    secondary_counter = 0
+    for i in range(image.shape[0]):
+        main_pixel = image[i, i]
+        if main_pixel == 0 and is_white_main:
+            main_counter += 1
+            is_white_main = False
+        elif main_pixel != 0:
+            is_white_main = True
+        secondary_pixel = image[i, last_col - i]
+        if secondary_pixel == 0 and is_white_secondary:
+            secondary_counter += 1
+            is_white_secondary = False
+        elif secondary_pixel != 0:
+            is_white_secondary = True
+    return main_counter, secondary_counter
+
+
 class FingerRegionRecognizerTemplate(ABC):
     """
     The FingerReGionRecognizer template has few implemented functions and it declares the operations that all concrete
@@ -43,6 +141,21 @@ class FingerRegionRecognizerTemplate(ABC):
         self.thin_image = None
         self.minutiae_weights_image = None
         self.mask = None
+        self._binary_thin = None
+        self._skeleton_source = None
+        self._erode_scratch = None
+
+    @property
+    def mask(self):
+        return self._mask
+
+    @mask.setter
+    def mask(self, mask):
+        # Kept alongside a boolean copy so window counts never depend on the
+        # mask's dtype or foreground value.
+        self._mask = mask
+        self.mask_bool = None if mask is None else mask != 0
+        self._valid_block_grid = None
 
     def run_first_phase(self, image: cv2.typing.MatLike) -> cv2.typing.MatLike:
         """
@@ -92,19 +205,31 @@ class FingerRegionRecognizerTemplate(ABC):
 
     @Access.final
     def fifth_step(self) -> cv2.typing.MatLike:
+        # Thinning is the costliest step, so the skeleton is reused until
+        # gabor_img is reassigned; callers must not modify it in place.
+        if self.thin_image is not None and self._skeleton_source is self.gabor_img:
+            return self.thin_image
         self.thin_image = self.__skeletonize(self.gabor_img)
+        self._binary_thin = (self.thin_image == 0).astype(np.uint8)
+        self._skeleton_source = self.gabor_img
         return self.thin_image
 
     @Access.final
     def sixth_step(self) -> cv2.typing.MatLike:
-        self.minutiae_weights_image = self.__calculate_minutiae_weights(self.thin_image)
+        self.minutiae_weights_image = self.__calculate_minutiae_weights(
+            self._binary_thin, self.mask_bool
+        )
         return self.minutiae_weights_image
 
     @Access.final
     def seventh_step(self) -> cv2.typing.MatLike:
         block_size = 15
+        if self._valid_block_grid is None:
+            self._valid_block_grid = _compute_valid_grid(
+                self.mask_bool, block_size, block_size * 8
+            )
         best_region = self.__get_best_region(
-            self.thin_image, self.minutiae_weights_image, block_size, self.mask
+            self.minutiae_weights_image, block_size, self._valid_block_grid
         )
         result_image = self.__draw_ridges_count_on_region(
             best_region, self.image, self.thin_image, block_size
@@ -112,76 +237,55 @@ class FingerRegionRecognizerTemplate(ABC):
         return result_image
 
     def __skeletonize(self, img):
-        binary_image = np.zeros_like(img)
-        binary_image[img == 0] = 1.0
+        if hasattr(cv2, "ximgproc"):
+            # OpenCV thinning expects ridges as 255 on a 0 background.
+            binary_image = np.where(img == 0, 255, 0).astype(np.uint8)
+            skeleton = cv2.ximgproc.thinning(
+                binary_image, thinningType=cv2.ximgproc.THINNING_ZHANGSUEN
+            )
+            return cv2.bitwise_not(skeleton)
 
-        skeleton = ski_skeletonize(binary_image)
+        skeleton = ski_skeletonize(img == 0)
 
         output_img = (1 - skeleton) * 255.0
         return output_img.astype(np.uint8)
 
-    def __detect_minutiae(self, image, row, col):
-        if image[row][col] == 1:
-            kernel = [
-                (-1, -1),
-                (-1, 0),
-                (-1, 1),
-                (0, 1),
-                (1, 1),
-                (1, 0),
-                (1, -1),
-                (0, -1),
-                (-1, -1),
-            ]
-            values = []
-            for k, l in kernel:
-                values.append(image[row + l][col + k])
-            crossings = (
-                sum(abs(values[k] - values[k + 1]) for k in range(len(values) - 1)) // 2
-            )
-            if crossings == 1:
-                return "termination"
-            if crossings == 3:
-                return "bifurcation"
-        return "none"
-
-    def __calculate_minutiae_weights(self, image):
-        binary_image = (image == 0).astype(np.int8)
-        minutiae_weights_array = np.zeros_like(image, dtype=np.float_)
-
-        for col in range(1, image.shape[1] - 1):
-            for row in range(1, image.shape[0] - 1):
-                minutiae = self.__detect_minutiae(binary_image, row, col)
-                if minutiae == "bifurcation":
-                    minutiae_weights_array[row, col] += 1.0
-                elif minutiae == "termination":
-                    minutiae_weights_array[row, col] += 2.0
+    def __calculate_minutiae_weights(self, binary_image, mask):
+        minutiae_weights_array = np.zeros(binary_image.shape, dtype=np.uint8)
+
+        # One filter pass encodes every pixel's 8 neighbours as a byte, and a
+        # lookup table maps each code straight to its minutiae weight.
+        codes = cv2.filter2D(
+            binary_image,
+            -1,
+            _NEIGHBOR_CODE_KERNEL,
+            borderType=cv2.BORDER_CONSTANT,
+        )
+        center = binary_image[1:-1, 1:-1] == 1
+        if mask is not None:
+            # Only windows lying fully inside the mask are ever scored, so
+            # pixels outside it keep a zero weight.
+            center &= mask[1:-1, 1:-1]
+        minutiae_weights_array[1:-1, 1:-1] = _CODE_WEIGHTS[codes[1:-1, 1:-1]] * center
 
         return minutiae_weights_array
 
     def __count_lines(self, image):
-        kernel = np.ones((3, 3), dtype=np.uint8)
-        eroded_image = cv2.erode(image, kernel)
-        binary_image = cv2.threshold(eroded_image, 127, 255, cv2.THRESH_BINARY)[1]
-        main_diagonal = self.__count_diagonal_lines(binary_image)
-        secondary_diagonal = self.__count_diagonal_lines(np.fliplr(binary_image))
+        # Both erosion passes write into a scratch buffer reused across calls.
+        if self._erode_scratch is None or self._erode_scratch.shape[1:] != image.shape:
+            self._erode_scratch = np.empty((2,) + image.shape, dtype=np.uint8)
+        # A 3x3 box erosion is a 1x3 pass followed by a 3x1 pass.
+        cv2.erode(image, _K1x3, dst=self._erode_scratch[0])
+        eroded_image = cv2.erode(
+            self._erode_scratch[0], _K3x1, dst=self._erode_scratch[1]
+        )
+        main_diagonal, secondary_diagonal = _count_both_diagonals(eroded_image)
         return (
             (secondary_diagonal, "secondary_diagonal")
             if main_diagonal <= secondary_diagonal
             else (main_diagonal, "main_diagonal")
         )
 
-    def __count_diagonal_lines(self, image):
-        is_white = True
-        counter = 0
-        for i in range(image.shape[0]):
-            if image[i][i] == 0 and is_white:
-                counter += 1
-                is_white = False
-            if image[i][i] == 255:
-                is_white = True
-        return counter
-
     def __draw_diagonal(
         self,
         image,
@@ -209,36 +313,23 @@ class FingerRegionRecognizerTemplate(ABC):
             image, "ridges", (text_y, text_x), cv2.FONT_HERSHEY_TRIPLEX, 0.5, color, 1
         )
 
-    def __get_best_region(self, thin_image, minutiae_weights_image, block_size, mask):
-        best_region = None
-        block_minutiaes_weight = float("inf")
-        rows, cols = thin_image.shape
+    def __get_best_region(self, minutiae_weights_image, block_size, valid_grid):
         shape_block = block_size * 8
-        window = (shape_block // block_size) - 1
-        for col in range(1, cols - window):
-            for row in range(1, rows - window):
-                mask_slice = mask[
-                    col * block_size : col * block_size + shape_block,
-                    row * block_size : row * block_size + shape_block,
-                ]
-                mask_flag = np.sum(mask_slice)
-                if mask_flag == shape_block * shape_block:
-                    number_vision_problems = np.sum(
-                        minutiae_weights_image[
-                            col * block_size : col * block_size + shape_block,
-                            row * block_size : row * block_size + shape_block,
-                        ]
-                    )
-                    if number_vision_problems <= block_minutiaes_weight:
-                        block_minutiaes_weight = number_vision_problems
-                        best_region = [
-                            col * block_size,
-                            col * block_size + shape_block,
-                            row * block_size,
-                            row * block_size + shape_block,
-                        ]
-        if best_region:
-            return best_region
+        valid_idx = np.flatnonzero(valid_grid)
+        if valid_idx.size == 0:
+            return None
+
+        # Summed-area tables turn every window sum into four lookups.
+        weights_integral = cv2.integral(minutiae_weights_image, sdepth=cv2.CV_32S)
+        weight_sums = _window_sums(weights_integral, block_size, shape_block)
+        weight_sums = weight_sums.ravel()[valid_idx]
+        # Ties go to the last window in row-major scan order.
+        best_idx = valid_idx[valid_idx.size - 1 - np.argmin(weight_sums[::-1])]
+
+        row, col = divmod(int(best_idx), valid_grid.shape[1])
+        r0 = (row + 1) * block_size
+        c0 = (col + 1) * block_size
+        return (r0, r0 + shape_block, c0, c0 + shape_block)
 
     def __draw_ridges_count_on_region(
         self, region, input_image, thin_image, block_size
@@ -246,8 +337,8 @@ class FingerRegionRecognizerTemplate(ABC):
         output_image = cv2.cvtColor(input_image.copy(), cv2.COLOR_GRAY2RGB)
         if region is None:
             return output_image
-        region_copy = (thin_image[region[0] : region[1], region[2] : region[3]]).copy()
-        line_count, line_type = self.__count_lines(region_copy)
+        region_view = thin_image[region[0] : region[1], region[2] : region[3]]
+        line_count, line_type = self.__count_lines(region_view)
         text_y = (region[3] - region[2]) // 2 + region[2]
         if line_type == "main_diagonal":
             text_x = (region[1] - region[0]) // 3 + region[0]